@@ -11,14 +11,18 @@ Usage:
 Then open http://localhost:8080 in your browser
 """
 
+import atexit
+import csv
 import http.server
-import socketserver
 import json
 import os
 import sys
+import threading
 import urllib.parse
 import math
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 
 # Add tools directory to path
 sys.path.append(os.path.join(os.path.dirname(__file__), 'tools'))
@@ -26,41 +30,290 @@ sys.path.append(os.path.join(os.path.dirname(__file__), 'tools'))
 os.chdir(os.path.dirname(__file__))
 
 try:
-    from java_searoute_wrapper import JavaSeaRouteWrapper
+    from java_searoute_wrapper import (JavaSeaRouteWrapper, JPypeSeaRouteWrapper,
+                                       SeaRouteServerWrapper, JPYPE_AVAILABLE)
     JAVA_AVAILABLE = True
 except ImportError:
     JAVA_AVAILABLE = False
 
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+from port_index import PortIndex
+from great_circle import KM_PER_NM, haversine_km
+from distance_cache import DistanceCache
+
+def dumps_json(data):
+    """Serialize an API response body, using orjson when it is installed"""
+    if ORJSON_AVAILABLE:
+        # Year-keyed dicts (ETS costs) need OPT_NON_STR_KEYS
+        return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(data).encode()
+
+# Decimal places coordinates are rounded to before routing (~11 m)
+COORD_PRECISION = 4
+
+# Batches are split into at most this many chunks routed concurrently, each
+# holding at least ROUTES_PER_CHUNK routes. With the JAR every chunk is its
+# own Java process, with JPype it gets one of as many network copies; the
+# single SeaRoute server process answers the chunks one route at a time.
+MAX_ROUTE_WORKERS = min(4, os.cpu_count() or 1)
+ROUTES_PER_CHUNK = 16
+route_pool = ThreadPoolExecutor(max_workers=MAX_ROUTE_WORKERS)
+
+# Routes computed by any server process, kept across restarts
+distance_cache = DistanceCache('data/distance_cache.db')
+atexit.register(distance_cache.close)
+
+# Created once so Java detection runs at startup, not on every request
+_java_wrapper = None
+_java_wrapper_lock = threading.Lock()
+
+def get_java_wrapper():
+    """
+    Return the shared Java SeaRoute wrapper, creating it on first use
+    
+    Runs SeaRoute in-process through JPype when it is installed, otherwise
+    in a long-lived SeaRoute server process; if neither can be started, runs
+    the SeaRoute JAR per request.
+    """
+    global _java_wrapper
+    with _java_wrapper_lock:
+        if _java_wrapper is None and JPYPE_AVAILABLE:
+            try:
+                _java_wrapper = JPypeSeaRouteWrapper(workers=MAX_ROUTE_WORKERS)
+            except Exception as e:
+                print(f"In-process SeaRoute unavailable: {e}")
+        if _java_wrapper is None:
+            try:
+                _java_wrapper = SeaRouteServerWrapper()
+            except Exception as e:
+                print(f"SeaRoute server unavailable, using the JAR: {e}")
+        if _java_wrapper is None:
+            _java_wrapper = JavaSeaRouteWrapper()
+    return _java_wrapper
+
+# Limits for one /api/calculate_batch request, so uncached routes finish
+# within the Java SeaRoute batch timeout
+MAX_BATCH_PAIRS = 200
+MAX_BATCH_BODY_BYTES = 256 * 1024
+
+# Upper bound for the k parameter of /api/nearest_ports
+MAX_NEAREST_PORTS = 100
+
+# Share of covered emissions surrendered under the EU ETS maritime phase-in;
+# years not listed are fully phased in
+ETS_PHASE_IN = {2024: 0.40, 2025: 0.70}
+
+# Routes kept in memory per process (the disk cache has no limit)
+ROUTE_CACHE_SIZE = int(os.environ.get('ROUTE_CACHE_SIZE', 100_000))
+
+@lru_cache(maxsize=ROUTE_CACHE_SIZE)
+def java_route(origin_lon, origin_lat, dest_lon, dest_lat):
+    """
+    Calculate a route with Java SeaRoute, memoized per coordinate pair
+    
+    Returns (distance_km, distance_nm, route_complexity). Misses in memory
+    fall back to the disk cache before running Java. Failures raise
+    instead of returning, so they are never cached.
+    """
+    key = (origin_lon, origin_lat, dest_lon, dest_lat)
+    route = distance_cache.get(key)
+    if route is not None:
+        return route
+    
+    java_result = get_java_wrapper().calculate_distance(origin_lon, origin_lat, dest_lon, dest_lat)
+    if not java_result['success']:
+        raise RuntimeError(java_result['error'])
+    route = (java_result['distance_km'], java_result['distance_nm'],
+             java_result.get('route_complexity', 0))
+    distance_cache.put(key, route)
+    return route
+
+def _run_java_batch(keys):
+    """Route one chunk of route keys with the shared Java wrapper"""
+    return get_java_wrapper().calculate_multiple_routes([
+        {'origin_lon': key[0], 'origin_lat': key[1], 'dest_lon': key[2], 'dest_lat': key[3]}
+        for key in keys
+    ])
+
+def java_routes(keys):
+    """
+    Calculate several routes in as few Java SeaRoute runs as possible
+    
+    Routes already in the disk cache are not recalculated, and large batches
+    are split into up to MAX_ROUTE_WORKERS chunks routed concurrently.
+    Returns a dict mapping each key to its (distance_km, distance_nm,
+    route_complexity) tuple or, if that route failed, to an error message.
+    """
+    routes = {}
+    missing = []
+    for key in keys:
+        route = distance_cache.get(key)
+        if route is None:
+            missing.append(key)
+        else:
+            routes[key] = route
+    
+    if missing:
+        # The threads only wait on Java, which routes the chunks concurrently
+        # as far as the wrapper allows (see MAX_ROUTE_WORKERS)
+        chunk_count = min(MAX_ROUTE_WORKERS, math.ceil(len(missing) / ROUTES_PER_CHUNK))
+        chunk_size = math.ceil(len(missing) / chunk_count)
+        chunks = [missing[i:i + chunk_size] for i in range(0, len(missing), chunk_size)]
+        for chunk, batch_results in zip(chunks, route_pool.map(_run_java_batch, chunks)):
+            for i, key in enumerate(chunk):
+                java_result = batch_results[i] if i < len(batch_results) else {
+                    'success': False, 'error': 'No route returned'}
+                if java_result['success']:
+                    route = (java_result['distance_km'], java_result['distance_nm'],
+                             java_result.get('route_complexity', 0))
+                    distance_cache.put(key, route)
+                    routes[key] = route
+                else:
+                    routes[key] = java_result['error']
+    
+    return routes
+
+# Routes shorter than this are answered with the great circle distance;
+# at that scale SeaRoute cannot find a meaningfully different path
+SHORT_ROUTE_KM = 1.0
+SHORT_ROUTE_METHOD = 'Great Circle (points less than 1 km apart)'
+JAVA_ROUTE_METHOD = 'Java SeaRoute (Actual Shipping Routes)'
+FALLBACK_METHOD = 'Great Circle (fallback, SeaRoute unavailable)'
+FALLBACK_WARNING = ('SeaRoute could not calculate this route; the great circle '
+                    'distance underestimates the sailed route')
+
+def short_route(key):
+    """
+    Return (distance_km, distance_nm, route_complexity) for a route key whose
+    points are (nearly) the same, or None if it needs SeaRoute
+    """
+    origin_lon, origin_lat, dest_lon, dest_lat = key
+    if (origin_lon, origin_lat) == (dest_lon, dest_lat):
+        return (0.0, 0.0, 0)
+    distance_km = haversine_km(origin_lon, origin_lat, dest_lon, dest_lat)
+    if distance_km >= SHORT_ROUTE_KM:
+        return None
+    return (round(distance_km, 1), round(distance_km / KM_PER_NM, 1), 0)
+
+def fallback_distance(key, error):
+    """
+    Distance result for a route SeaRoute could not calculate
+    
+    Uses the great circle distance, which never exceeds the sailed distance.
+    The SeaRoute error (possibly a whole Java stack trace) is only logged;
+    clients get the fixed FALLBACK_WARNING.
+    """
+    print(f"SeaRoute failed for {key}, using great circle distance: {error}")
+    distance_km = haversine_km(*key)
+    return {
+        'distance_km': round(distance_km, 1),
+        'distance_nm': round(distance_km / KM_PER_NM, 1),
+        'method': FALLBACK_METHOD,
+        'route_complexity': 0,
+        'warning': FALLBACK_WARNING,
+        'success': True
+    }
+
+def route_key(origin_lat, origin_lon, dest_lat, dest_lon):
+    """Cache key for a route: rounded (lon, lat) pairs in canonical order"""
+    origin = (round(origin_lon, COORD_PRECISION), round(origin_lat, COORD_PRECISION))
+    dest = (round(dest_lon, COORD_PRECISION), round(dest_lat, COORD_PRECISION))
+    # Sea distance is symmetric, so A->B and B->A share one entry
+    if dest < origin:
+        origin, dest = dest, origin
+    return origin + dest
+
+def parse_coordinate(value):
+    """Parse a coordinate, rejecting NaN and infinities"""
+    number = float(value)
+    if not math.isfinite(number):
+        raise ValueError(f'Invalid coordinate: {value}')
+    return number
+
+def warm_up():
+    """
+    Pay one-off startup costs before the first request arrives
+    
+    Builds the port index and loads the MRV and ETS data, then runs a throwaway route so the JVM, the
+    SeaRoute JAR and the maritime network files are already in the OS page
+    cache when the first real route is requested.
+    """
+    CalculatorHandler.get_port_index()
+    CalculatorHandler.get_mrv_data()
+    CalculatorHandler.get_ets_prices()
+    if JAVA_AVAILABLE:
+        try:
+            java_result = get_java_wrapper().calculate_distance(0.0, 0.0, 1.0, 1.0)
+            if not java_result['success']:
+                print(f"Java SeaRoute warm-up failed: {java_result['error']}")
+        except Exception as e:
+            print(f"Java SeaRoute warm-up failed: {e}")
+
 class CalculatorHandler(http.server.SimpleHTTPRequestHandler):
+    # Built once per process and shared by all requests
+    port_index = None
+    port_index_lock = threading.Lock()
+    mrv_data = None
+    ets_prices = None
+    data_lock = threading.Lock()
+    main_page = None
+
+    # Exact path -> handler method name; anything else falls through
+    GET_ROUTES = {
+        '/': 'serve_main_page',
+        '/api/calculate': 'handle_calculation',
+        '/api/mrv': 'handle_mrv_calculation',
+        '/api/ports': 'handle_port_search',
+        '/api/nearest_ports': 'handle_nearest_ports',
+    }
+    POST_ROUTES = {
+        '/api/calculate_batch': 'handle_batch_calculation',
+    }
+    
     def do_GET(self):
-        if self.path == '/':
-            self.serve_main_page()
-        elif self.path.startswith('/api/calculate'):
-            self.handle_calculation()
-        elif self.path.startswith('/api/mrv'):
-            self.handle_mrv_calculation()
-        elif self.path.startswith('/api/ports'):
-            self.handle_port_search()
+        handler = self.GET_ROUTES.get(urllib.parse.urlsplit(self.path).path)
+        if handler:
+            getattr(self, handler)()
         else:
             super().do_GET()
     
+    def do_POST(self):
+        handler = self.POST_ROUTES.get(urllib.parse.urlsplit(self.path).path)
+        if handler:
+            getattr(self, handler)()
+        else:
+            self.send_error(404)
+
+    def query_params(self):
+        """Parse the query string, which may be missing entirely"""
+        return urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query)
+    
     def serve_main_page(self):
-        html_content = self.get_main_page_html()
+        # The page only depends on JAVA_AVAILABLE, so it is rendered once
+        cls = type(self)
+        if cls.main_page is None:
+            cls.main_page = self.get_main_page_html().encode()
         self.send_response(200)
         self.send_header('Content-type', 'text/html')
+        self.send_header('Content-Length', str(len(cls.main_page)))
         self.end_headers()
-        self.wfile.write(html_content.encode())
+        self.wfile.write(cls.main_page)
     
     
     def handle_calculation(self):
         try:
             # Parse query parameters
-            query_params = urllib.parse.parse_qs(self.path.split('?')[1])
+            query_params = self.query_params()
             
-            origin_lat = float(query_params['origin_lat'][0])
-            origin_lon = float(query_params['origin_lon'][0])
-            dest_lat = float(query_params['dest_lat'][0])
-            dest_lon = float(query_params['dest_lon'][0])
+            origin_lat = parse_coordinate(query_params['origin_lat'][0])
+            origin_lon = parse_coordinate(query_params['origin_lon'][0])
+            dest_lat = parse_coordinate(query_params['dest_lat'][0])
+            dest_lon = parse_coordinate(query_params['dest_lon'][0])
             
             # Calculate distances
             result = self.calculate_distances(origin_lat, origin_lon, dest_lat, dest_lon)
@@ -69,30 +322,118 @@ class CalculatorHandler(http.server.SimpleHTTPRequestHandler):
             self.send_response(200)
             self.send_header('Content-type', 'application/json')
             self.end_headers()
-            self.wfile.write(json.dumps(result).encode())
+            self.wfile.write(dumps_json(result))
+            
+        except Exception as e:
+            error_response = {'error': str(e)}
+            self.send_response(500)
+            self.send_header('Content-type', 'application/json')
+            self.end_headers()
+            self.wfile.write(dumps_json(error_response))
+    
+    def handle_batch_calculation(self):
+        """Calculate many routes in one request
+        
+        Expects a JSON body {"pairs": [[origin_lon, origin_lat, dest_lon, dest_lat], ...]}
+        with at most MAX_BATCH_PAIRS pairs and returns one distance result per
+        pair, in input order.
+        """
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            # A negative length would make rfile.read() wait for the client to close
+            if length < 0:
+                raise ValueError('Invalid Content-Length')
+            if length > MAX_BATCH_BODY_BYTES:
+                raise ValueError(f'Request body larger than {MAX_BATCH_BODY_BYTES} bytes')
+            body = self.rfile.read(length) or b'{}'
+            request = orjson.loads(body) if ORJSON_AVAILABLE else json.loads(body)
+            if not isinstance(request, dict) or not isinstance(request.get('pairs', []), list):
+                raise ValueError('Body must be a JSON object with a "pairs" list')
+            raw_pairs = request.get('pairs', [])
+            if len(raw_pairs) > MAX_BATCH_PAIRS:
+                raise ValueError(f'At most {MAX_BATCH_PAIRS} pairs per request')
+            # Checked before parsing, so e.g. a 4-character string is not taken as a pair
+            if any(not isinstance(pair, (list, tuple)) or len(pair) != 4 for pair in raw_pairs):
+                raise ValueError('Each pair must be [origin_lon, origin_lat, dest_lon, dest_lat]')
+            pairs = [[parse_coordinate(value) for value in pair] for pair in raw_pairs]
+        except Exception as e:
+            error_response = {'error': f'Invalid batch request: {e}'}
+            self.send_response(400)
+            self.send_header('Content-type', 'application/json')
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.end_headers()
+            self.wfile.write(dumps_json(error_response))
+            return
+        
+        try:
+            keys = [route_key(o_lat, o_lon, d_lat, d_lon) for o_lon, o_lat, d_lon, d_lat in pairs]
+            
+            # Duplicate pairs are only routed once
+            short_routes = {}
+            java_keys = []
+            for key in dict.fromkeys(keys):
+                route = short_route(key)
+                if route is None:
+                    java_keys.append(key)
+                else:
+                    short_routes[key] = route
+            
+            if JAVA_AVAILABLE:
+                routes = java_routes(java_keys)
+            else:
+                routes = dict.fromkeys(java_keys, 'Java not available')
+            routes.update(short_routes)
+            
+            results = []
+            for key in keys:
+                route = routes[key]
+                if isinstance(route, str):
+                    results.append(fallback_distance(key, route))
+                else:
+                    distance_km, distance_nm, route_complexity = route
+                    results.append({
+                        'distance_km': distance_km,
+                        'distance_nm': distance_nm,
+                        'method': SHORT_ROUTE_METHOD if key in short_routes else JAVA_ROUTE_METHOD,
+                        'route_complexity': route_complexity,
+                        'success': True
+                    })
+            
+            result = {
+                'timestamp': datetime.now().isoformat(),
+                'results': results
+            }
+            
+            # Send JSON response
+            self.send_response(200)
+            self.send_header('Content-type', 'application/json')
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.end_headers()
+            self.wfile.write(dumps_json(result))
             
         except Exception as e:
             error_response = {'error': str(e)}
             self.send_response(500)
             self.send_header('Content-type', 'application/json')
+            self.send_header('Access-Control-Allow-Origin', '*')
             self.end_headers()
-            self.wfile.write(json.dumps(error_response).encode())
+            self.wfile.write(dumps_json(error_response))
     
     def handle_port_search(self):
         try:
-            query_params = urllib.parse.parse_qs(self.path.split('?')[1])
+            query_params = self.query_params()
             search_term = query_params.get('q', [''])[0]
             
-            # Load ports and search
-            ports = self.load_ports()
-            matches = self.search_ports(ports, search_term)
+            # Search the shared port index
+            port_index = self.get_port_index()
+            port_ids = port_index.search_ids(search_term)[:10]  # Limit to 10 results
             
             # Send JSON response
             self.send_response(200)
             self.send_header('Content-type', 'application/json')
             self.send_header('Access-Control-Allow-Origin', '*')
             self.end_headers()
-            self.wfile.write(json.dumps(matches[:10]).encode())  # Limit to 10 results
+            self.wfile.write(port_index.ports_json(port_ids))
             
         except Exception as e:
             print(f"Port search error: {e}")
@@ -101,76 +442,115 @@ class CalculatorHandler(http.server.SimpleHTTPRequestHandler):
             self.send_header('Content-type', 'application/json')
             self.send_header('Access-Control-Allow-Origin', '*')
             self.end_headers()
-            self.wfile.write(json.dumps(error_response).encode())
+            self.wfile.write(dumps_json(error_response))
+    
+    def handle_nearest_ports(self):
+        """Return the ports closest to a coordinate, by great circle distance"""
+        try:
+            query_params = self.query_params()
+            lat = parse_coordinate(query_params.get('lat', ['0'])[0])
+            lon = parse_coordinate(query_params.get('lon', ['0'])[0])
+            k = max(1, min(int(query_params.get('k', ['10'])[0]), MAX_NEAREST_PORTS))
+            
+            port_index = self.get_port_index()
+            ports = []
+            for port_id, distance_km in port_index.nearest_ports(lat, lon, k):
+                port = port_index.port(port_id).as_dict()
+                port['distance_km'] = round(distance_km, 1)
+                port['distance_nm'] = round(distance_km / KM_PER_NM, 1)
+                ports.append(port)
+            
+            # Send JSON response
+            self.send_response(200)
+            self.send_header('Content-type', 'application/json')
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.end_headers()
+            self.wfile.write(dumps_json(ports))
+            
+        except Exception as e:
+            error_response = {'error': str(e)}
+            self.send_response(500)
+            self.send_header('Content-type', 'application/json')
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.end_headers()
+            self.wfile.write(dumps_json(error_response))
     
     def calculate_distances(self, origin_lat, origin_lon, dest_lat, dest_lon):
-        """Calculate distances using Java SeaRoute"""
+        """Calculate distances using Java SeaRoute, falling back to great circle"""
         result = {
             'timestamp': datetime.now().isoformat(),
             'origin': {'lat': origin_lat, 'lon': origin_lon},
             'destination': {'lat': dest_lat, 'lon': dest_lon}
         }
         
+        key = route_key(origin_lat, origin_lon, dest_lat, dest_lon)
+        route = short_route(key)
+        if route is not None:
+            distance_km, distance_nm, route_complexity = route
+            result['distance'] = {
+                'distance_km': distance_km,
+                'distance_nm': distance_nm,
+                'method': SHORT_ROUTE_METHOD,
+                'route_complexity': route_complexity,
+                'success': True
+            }
         # Try Java SeaRoute if available
-        if JAVA_AVAILABLE:
+        elif JAVA_AVAILABLE:
             try:
-                java_wrapper = JavaSeaRouteWrapper()
-                java_result = java_wrapper.calculate_distance(origin_lon, origin_lat, dest_lon, dest_lat)
+                distance_km, distance_nm, route_complexity = java_route(*key)
                 
-                if java_result['success']:
-                    result['distance'] = {
-                        'distance_km': java_result['distance_km'],
-                        'distance_nm': java_result['distance_nm'],
-                        'method': 'Java SeaRoute (Actual Shipping Routes)',
-                        'route_complexity': java_result.get('route_complexity', 0),
-                        'success': True
-                    }
-                else:
-                    result['distance'] = {
-                        'error': java_result['error'],
-                        'success': False
-                    }
-                    
-            except Exception as e:
                 result['distance'] = {
-                    'error': str(e),
-                    'success': False
+                    'distance_km': distance_km,
+                    'distance_nm': distance_nm,
+                    'method': JAVA_ROUTE_METHOD,
+                    'route_complexity': route_complexity,
+                    'success': True
                 }
+                    
+            except Exception as e:
+                result['distance'] = fallback_distance(key, str(e))
         else:
-            result['distance'] = {
-                'error': 'Java not available - please install Java to use this application',
-                'success': False
-            }
+            result['distance'] = fallback_distance(key, 'Java not available')
         
         return result
     
-    def load_ports(self):
-        """Load port data"""
-        try:
-            ports_file = 'data/ports.json'
-            with open(ports_file, 'r', encoding='utf-8') as f:
-                ports = json.load(f)
-                print(f"Loaded {len(ports)} ports from {ports_file}")
-                return ports
-        except Exception as e:
-            print(f"Error loading ports: {e}")
-            return []
+    @classmethod
+    def get_port_index(cls):
+        """Return the shared port index, building it on first use"""
+        with cls.port_index_lock:
+            if cls.port_index is None:
+                cls.port_index = PortIndex.from_file('data/ports.json')
+        return cls.port_index
+    
+    @classmethod
+    def get_mrv_data(cls):
+        """Return the shared MRV ship records, loading them on first use"""
+        with cls.data_lock:
+            if cls.mrv_data is None:
+                cls.mrv_data = cls.load_mrv_data()
+        return cls.mrv_data
+    
+    @classmethod
+    def get_ets_prices(cls):
+        """Return the shared ETS prices, loading them on first use"""
+        with cls.data_lock:
+            if cls.ets_prices is None:
+                cls.ets_prices = cls.load_ets_prices()
+        return cls.ets_prices
     
-    def load_mrv_data(self):
+    @staticmethod
+    def load_mrv_data():
         """Load MRV ship emissions data"""
         try:
             mrv_data = {}
-            with open('data/mrv_data.csv', 'r', encoding='utf-8') as f:
-                next(f)  # Skip header
-                for line in f:
-                    parts = line.strip().split(',')
-                    if len(parts) >= 3:
-                        imo = parts[0]
-                        co2_per_nm = float(parts[1])
-                        co2eq_per_nm = float(parts[2])
-                        mrv_data[imo] = {
-                            'co2_per_nm': co2_per_nm,
-                            'co2eq_per_nm': co2eq_per_nm
+            with open('data/mrv_data.csv', 'r', encoding='utf-8', newline='') as f:
+                reader = csv.reader(f)
+                next(reader, None)  # Skip header
+                for row in reader:
+                    if len(row) >= 3:
+                        mrv_data[row[0].strip()] = {
+                            'co2_per_nm': float(row[1]),
+                            'co2eq_per_nm': float(row[2])
                         }
             print(f"Loaded {len(mrv_data)} MRV ship records")
             return mrv_data
@@ -178,18 +558,17 @@ class CalculatorHandler(http.server.SimpleHTTPRequestHandler):
             print(f"Error loading MRV data: {e}")
             return {}
     
-    def load_ets_prices(self):
+    @staticmethod
+    def load_ets_prices():
         """Load ETS price data"""
         try:
             prices = {}
-            with open('data/ets_price.csv', 'r', encoding='utf-8') as f:
-                next(f)  # Skip header
-                for line in f:
-                    parts = line.strip().split(',')
-                    if len(parts) >= 2:
-                        year = int(parts[0])
-                        price = float(parts[1])
-                        prices[year] = price
+            with open('data/ets_price.csv', 'r', encoding='utf-8', newline='') as f:
+                reader = csv.reader(f)
+                next(reader, None)  # Skip header
+                for row in reader:
+                    if len(row) >= 2:
+                        prices[int(row[0])] = float(row[1])
             print(f"Loaded ETS prices for {len(prices)} years")
             return prices
         except Exception as e:
@@ -200,17 +579,17 @@ class CalculatorHandler(http.server.SimpleHTTPRequestHandler):
         """Handle MRV emissions and ETS cost calculation"""
         try:
             # Parse query parameters
-            query_params = urllib.parse.parse_qs(self.path.split('?')[1])
+            query_params = self.query_params()
             
             imo_number = query_params.get('imo', [''])[0]
-            origin_lat = float(query_params.get('origin_lat', ['0'])[0])
-            origin_lon = float(query_params.get('origin_lon', ['0'])[0])
-            dest_lat = float(query_params.get('dest_lat', ['0'])[0])
-            dest_lon = float(query_params.get('dest_lon', ['0'])[0])
+            origin_lat = parse_coordinate(query_params.get('origin_lat', ['0'])[0])
+            origin_lon = parse_coordinate(query_params.get('origin_lon', ['0'])[0])
+            dest_lat = parse_coordinate(query_params.get('dest_lat', ['0'])[0])
+            dest_lon = parse_coordinate(query_params.get('dest_lon', ['0'])[0])
             
             # Load MRV data
-            mrv_data = self.load_mrv_data()
-            ets_prices = self.load_ets_prices()
+            mrv_data = self.get_mrv_data()
+            ets_prices = self.get_ets_prices()
             
             # Get ship data
             if imo_number not in mrv_data:
@@ -219,7 +598,7 @@ class CalculatorHandler(http.server.SimpleHTTPRequestHandler):
                 self.send_header('Content-type', 'application/json')
                 self.send_header('Access-Control-Allow-Origin', '*')
                 self.end_headers()
-                self.wfile.write(json.dumps(error_response).encode())
+                self.wfile.write(dumps_json(error_response))
                 return
             
             ship_data = mrv_data[imo_number]
@@ -227,40 +606,20 @@ class CalculatorHandler(http.server.SimpleHTTPRequestHandler):
             # Calculate distance
             distance_result = self.calculate_distances(origin_lat, origin_lon, dest_lat, dest_lon)
             
-            if not distance_result['distance']['success']:
-                error_response = {'error': f"Distance calculation failed: {distance_result['distance'].get('error', 'Unknown error')}"}
-                self.send_response(400)
-                self.send_header('Content-type', 'application/json')
-                self.send_header('Access-Control-Allow-Origin', '*')
-                self.end_headers()
-                self.wfile.write(json.dumps(error_response).encode())
-                return
-            
             distance_nm = distance_result['distance']['distance_nm']
             
             # Calculate emissions
             co2_emissions_t = (ship_data['co2_per_nm'] * distance_nm) / 1000  # Convert kg to tonnes
             co2eq_emissions_t = (ship_data['co2eq_per_nm'] * distance_nm) / 1000
             
-            # Load ports to determine ETS coverage
-            ports = self.load_ports()
-            origin_port = None
-            dest_port = None
-            
-            # Find closest ports (simplified - in production would use distance calculation)
-            for port in ports:
-                if abs(port['lat'] - origin_lat) < 0.01 and abs(port['lon'] - origin_lon) < 0.01:
-                    origin_port = port
-                    break
-            
-            for port in ports:
-                if abs(port['lat'] - dest_lat) < 0.01 and abs(port['lon'] - dest_lon) < 0.01:
-                    dest_port = port
-                    break
+            # Find the ports at the given coordinates to determine ETS coverage
+            port_index = self.get_port_index()
+            origin_port = port_index.find_port(origin_lat, origin_lon)
+            dest_port = port_index.find_port(dest_lat, dest_lon)
             
             # Determine ETS coverage
-            origin_eea = origin_port.get('is_eea', False) if origin_port else False
-            dest_eea = dest_port.get('is_eea', False) if dest_port else False
+            origin_eea = origin_port.is_eea if origin_port else False
+            dest_eea = dest_port.is_eea if dest_port else False
             
             if origin_eea and dest_eea:
                 coverage = 1.0  # 100% intra-EEA
@@ -281,12 +640,7 @@ class CalculatorHandler(http.server.SimpleHTTPRequestHandler):
                 price_eur = ets_prices[year]
                 
                 # Phase-in schedule
-                if year == 2024:
-                    phase_in = 0.40
-                elif year == 2025:
-                    phase_in = 0.70
-                else:
-                    phase_in = 1.00
+                phase_in = ETS_PHASE_IN.get(year, 1.00)
                 
                 # Calculate cost (use CO2 for 2024-2025, CO2eq for 2026+)
                 if year <= 2025:
@@ -317,7 +671,9 @@ class CalculatorHandler(http.server.SimpleHTTPRequestHandler):
                     'origin_eea': origin_eea,
                     'dest_eea': dest_eea
                 },
-                'ets_costs': ets_costs
+                'ets_costs': ets_costs,
+                # Costs rest on the great circle fallback, not a sea route
+                'estimated': distance_result['distance']['method'] == FALLBACK_METHOD
             }
             
             # Send JSON response
@@ -325,7 +681,7 @@ class CalculatorHandler(http.server.SimpleHTTPRequestHandler):
             self.send_header('Content-type', 'application/json')
             self.send_header('Access-Control-Allow-Origin', '*')
             self.end_headers()
-            self.wfile.write(json.dumps(result).encode())
+            self.wfile.write(dumps_json(result))
             
         except Exception as e:
             error_response = {'error': str(e)}
@@ -333,46 +689,7 @@ class CalculatorHandler(http.server.SimpleHTTPRequestHandler):
             self.send_header('Content-type', 'application/json')
             self.send_header('Access-Control-Allow-Origin', '*')
             self.end_headers()
-            self.wfile.write(json.dumps(error_response).encode())
-    
-    def search_ports(self, ports, search_term):
-        """Search ports by name or country"""
-        if not search_term or len(search_term) < 2:
-            return []
-        
-        search_term = search_term.lower()
-        matches = []
-        
-        for port in ports:
-            try:
-                port_name = port.get('name', '').lower()
-                port_country = str(port.get('country', '')).lower()
-                
-                if (search_term in port_name or search_term in port_country):
-                    matches.append({
-                        'name': port.get('name', ''),
-                        'country': port.get('country', ''),
-                        'lat': float(port.get('lat', 0)),
-                        'lon': float(port.get('lon', 0)),
-                        'is_eea': port.get('is_eea', False)
-                    })
-            except (ValueError, TypeError) as e:
-                # Skip ports with invalid data
-                continue
-        
-        # Sort by relevance (exact matches first)
-        def sort_key(port):
-            name_match = search_term in port['name'].lower()
-            country_match = search_term in str(port['country']).lower()
-            if name_match and country_match:
-                return (0, port['name'])
-            elif name_match:
-                return (1, port['name'])
-            else:
-                return (2, port['name'])
-        
-        matches.sort(key=sort_key)
-        return matches[:20]  # Limit results
+            self.wfile.write(dumps_json(error_response))
     
     def get_main_page_html(self):
         return f"""
@@ -910,30 +1227,53 @@ class CalculatorHandler(http.server.SimpleHTTPRequestHandler):
             updateMRVCalculateButton();
         }});
         
+        // Wait for a pause in typing before searching, so typing a port name
+        // sends one request instead of one per keystroke
+        const SEARCH_DEBOUNCE_MS = 200;
+        const searchTimers = {{}};
+        // In-flight search per box; a newer query cancels it, so a slow
+        // stale response can never overwrite newer results
+        const searchControllers = {{}};
+        
         function searchPorts(query, resultsId, onSelect) {{
+            clearTimeout(searchTimers[resultsId]);
+            if (searchControllers[resultsId]) {{
+                searchControllers[resultsId].abort();
+            }}
             if (query.length < 2) {{
                 document.getElementById(resultsId).style.display = 'none';
                 return;
             }}
             
-            fetch(`/api/ports?q=${{encodeURIComponent(query)}}`)
+            searchTimers[resultsId] = setTimeout(() => fetchPorts(query, resultsId, onSelect), SEARCH_DEBOUNCE_MS);
+        }}
+        
+        function fetchPorts(query, resultsId, onSelect) {{
+            const controller = new AbortController();
+            searchControllers[resultsId] = controller;
+            
+            fetch(`/api/ports?q=${{encodeURIComponent(query)}}`, {{ signal: controller.signal }})
                 .then(response => response.json())
                 .then(ports => {{
                     const resultsDiv = document.getElementById(resultsId);
-                    resultsDiv.innerHTML = '';
                     
+                    // Build the rows off-document and swap them in with one DOM update
+                    const fragment = document.createDocumentFragment();
                     ports.forEach(port => {{
                         const div = document.createElement('div');
                         div.className = 'search-result';
-                        div.innerHTML = `${{port.name}} (${{port.country}}) ${{port.is_eea ? '🇪🇺' : ''}}`;
+                        div.textContent = `${{port.name}} (${{port.country}}) ${{port.is_eea ? '🇪🇺' : ''}}`;
                         div.onclick = () => onSelect(port);
-                        resultsDiv.appendChild(div);
+                        fragment.appendChild(div);
                     }});
+                    resultsDiv.replaceChildren(fragment);
                     
                     resultsDiv.style.display = ports.length > 0 ? 'block' : 'none';
                 }})
                 .catch(error => {{
-                    console.error('Search error:', error);
+                    if (error.name !== 'AbortError') {{
+                        console.error('Search error:', error);
+                    }}
                 }});
         }}
         
@@ -988,7 +1328,8 @@ class CalculatorHandler(http.server.SimpleHTTPRequestHandler):
                         <div class="result-value">${{data.distance.distance_nm.toFixed(1)}} <span style="font-size: 1.5rem; color: #64748b;">nm</span></div>
                         <div class="result-subtitle">${{data.distance.distance_km.toFixed(1)}} kilometers</div>
                         <div class="result-meta">Route complexity: ${{data.distance.route_complexity}} waypoints</div>
-                        <div class="result-meta">Method: Java SeaRoute (Actual Shipping Routes)</div>
+                        <div class="result-meta">Method: ${{data.distance.method}}</div>
+                        ${{data.distance.warning ? '<div class="result-meta" data-warning></div>' : ''}}
                     </div>
                 `;
             }} else {{
@@ -1023,6 +1364,10 @@ class CalculatorHandler(http.server.SimpleHTTPRequestHandler):
             `;
             
             contentDiv.innerHTML = html;
+            // Server text goes in as plain text, never as markup
+            contentDiv.querySelectorAll('[data-warning]').forEach(el => {{
+                el.textContent = `⚠ ${{data.distance.warning}}`;
+            }});
         }}
         
         function calculateMRV() {{
@@ -1080,6 +1425,8 @@ class CalculatorHandler(http.server.SimpleHTTPRequestHandler):
                             <div class="result-header">📏 Distance</div>
                             <div class="result-value">${{data.distance.distance_nm.toFixed(1)}} <span style="font-size: 1.5rem; color: #64748b;">nm</span></div>
                             <div class="result-subtitle">${{data.distance.distance_km.toFixed(1)}} kilometers</div>
+                            <div class="result-meta">Method: ${{data.distance.method}}</div>
+                            ${{data.distance.warning ? '<div class="result-meta" data-warning></div>' : ''}}
                         </div>
                     `;
                 }}
@@ -1112,6 +1459,7 @@ class CalculatorHandler(http.server.SimpleHTTPRequestHandler):
                     
                     <div class="result-card">
                         <div class="result-header">💰 ETS Costs by Year</div>
+                        ${{data.estimated ? `<div class="result-meta">⚠ Estimated from the great circle distance; actual costs will be higher</div>` : ''}}
                         <div class="cost-grid">
                 `;
                 
@@ -1133,6 +1481,10 @@ class CalculatorHandler(http.server.SimpleHTTPRequestHandler):
             }}
             
             contentDiv.innerHTML = html;
+            // Server text goes in as plain text, never as markup
+            contentDiv.querySelectorAll('[data-warning]').forEach(el => {{
+                el.textContent = `⚠ ${{data.distance.warning}}`;
+            }});
         }}
     </script>
 </body>
@@ -1147,19 +1499,24 @@ def main():
     print("EU ETS COST CALCULATOR - WEB SERVER")
     print("=" * 60)
     print(f"Java SeaRoute Available: {'Yes' if JAVA_AVAILABLE else 'No'}")
-    print(f"Starting server on port {{PORT}}...")
-    print(f"Open your browser and go to: http://localhost:{{PORT}}")
+    print(f"Starting server on port {PORT}...")
+    print(f"Open your browser and go to: http://localhost:{PORT}")
     print("Press Ctrl+C to stop the server")
     print("=" * 60)
     
+    # Warm up in the background so the server starts accepting immediately
+    threading.Thread(target=warm_up, daemon=True).start()
+    
     try:
-        with socketserver.TCPServer(("", PORT), CalculatorHandler) as httpd:
-            print(f"Server running at http://0.0.0.0:{{PORT}}")
+        # One thread per request, so a slow route calculation does not
+        # block port searches and page loads from other clients
+        with http.server.ThreadingHTTPServer(("", PORT), CalculatorHandler) as httpd:
+            print(f"Server running at http://0.0.0.0:{PORT}")
             httpd.serve_forever()
     except KeyboardInterrupt:
-        print("\\nServer stopped.")
+        print("\nServer stopped.")
     except Exception as e:
-        print(f"Error starting server: {{e}}")
+        print(f"Error starting server: {e}")
 
 if __name__ == "__main__":
     main()
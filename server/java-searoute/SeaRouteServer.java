@@ -0,0 +1,54 @@
+import java.io.BufferedReader;
+import java.io.InputStreamReader;
+import java.io.PrintStream;
+
+import org.locationtech.jts.geom.Geometry;
+
+import eu.europa.ec.eurostat.jgiscotools.feature.Feature;
+import eu.europa.ec.eurostat.searoute.SeaRouting;
+
+/**
+ * Long-lived SeaRoute process for the Python wrapper.
+ *
+ * Loads the maritime network once, prints "READY", then answers one route
+ * per line: reads "olon olat dlon dlat" on stdin and writes
+ * "distKM numPoints" (or "ERROR message") on stdout. Exits when stdin closes.
+ *
+ * Run from this directory with Java 11+ (no compilation needed):
+ *   java -cp searoute.jar SeaRouteServer.java [resolution]
+ */
+public class SeaRouteServer {
+
+	public static void main(String[] args) throws Exception {
+		int resolution = args.length > 0 ? Integer.parseInt(args[0]) : 20;
+
+		// Keep library logging off the protocol stream
+		PrintStream out = System.out;
+		System.setOut(System.err);
+
+		SeaRouting routing = new SeaRouting(resolution);
+		out.println("READY");
+		out.flush();
+
+		BufferedReader in = new BufferedReader(new InputStreamReader(System.in));
+		String line;
+		while ((line = in.readLine()) != null) {
+			line = line.trim();
+			if (line.isEmpty()) continue;
+			try {
+				String[] parts = line.split("\\s+");
+				Feature route = routing.getRoute(Double.parseDouble(parts[0]), Double.parseDouble(parts[1]),
+						Double.parseDouble(parts[2]), Double.parseDouble(parts[3]));
+				Object distKM = route.getAttribute("distKM");
+				Geometry geometry = route.getGeometry();
+				if (distKM == null)
+					out.println("ERROR No route found");
+				else
+					out.println(distKM + " " + (geometry == null ? 0 : geometry.getNumPoints()));
+			} catch (Exception e) {
+				out.println("ERROR " + String.valueOf(e.getMessage()).replace('\n', ' '));
+			}
+			out.flush();
+		}
+	}
+}
@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+"""
+Build the port index cache ahead of time
+Parses the ports JSON file and writes the pickled PortIndex next to it, so a
+fresh deployment does not pay for parsing and indexing on its first start
+
+Usage (from the server directory):
+    python tools/build_port_cache.py [ports_file]
+"""
+
+import os
+import sys
+
+from port_index import PortIndex
+
+
+def main():
+    ports_file = sys.argv[1] if len(sys.argv) > 1 else 'data/ports.json'
+    cache_file = os.path.splitext(ports_file)[0] + '.pkl'
+
+    # Always rebuild from the JSON, even if a cache already exists
+    if os.path.exists(cache_file):
+        os.remove(cache_file)
+
+    index = PortIndex.from_file(ports_file, cache_file)
+    if len(index) == 0 or not os.path.exists(cache_file):
+        print("Port cache was not built")
+        sys.exit(1)
+    print(f"Wrote {cache_file}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Disk-backed route distance cache
+Keeps computed SeaRoute distances in SQLite so they survive restarts and are
+shared by every server process using the same data directory
+"""
+
+import sqlite3
+import threading
+from typing import Optional, Tuple
+
+# (origin_lon, origin_lat, dest_lon, dest_lat)
+RouteKey = Tuple[float, float, float, float]
+# (distance_km, distance_nm, route_complexity)
+RouteValue = Tuple[float, float, int]
+
+
+class DistanceCache:
+    """SQLite cache of route distances keyed by rounded coordinates"""
+
+    def __init__(self, db_path: str = "data/distance_cache.db"):
+        """
+        Open (or create) the cache database
+
+        Args:
+            db_path: Path to the SQLite database file
+        """
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = None
+
+        try:
+            conn = sqlite3.connect(db_path, timeout=10, check_same_thread=False)
+            # WAL lets several processes read while one writes
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS routes ('
+                'olon REAL, olat REAL, dlon REAL, dlat REAL, '
+                'distance_km REAL, distance_nm REAL, route_complexity INTEGER, '
+                'PRIMARY KEY (olon, olat, dlon, dlat))'
+            )
+            conn.commit()
+            self._conn = conn
+        except sqlite3.Error as e:
+            print(f"Distance cache disabled: {e}")
+
+    def get(self, key: RouteKey) -> Optional[RouteValue]:
+        """Return the cached route for key, or None"""
+        if self._conn is None:
+            return None
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    'SELECT distance_km, distance_nm, route_complexity FROM routes '
+                    'WHERE olon = ? AND olat = ? AND dlon = ? AND dlat = ?', key
+                ).fetchone()
+        except sqlite3.Error:
+            return None
+        return tuple(row) if row else None
+
+    def put(self, key: RouteKey, value: RouteValue):
+        """Store a computed route"""
+        if self._conn is None:
+            return
+        try:
+            with self._lock:
+                self._conn.execute(
+                    'INSERT OR REPLACE INTO routes VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    key + tuple(value)
+                )
+                self._conn.commit()
+        except sqlite3.Error as e:
+            print(f"Could not write distance cache: {e}")
+
+    def close(self):
+        """Close the database connection"""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+Great circle distances
+Straight-line distance over the Earth's surface, used where running the
+SeaRoute network would not change the answer (e.g. coincident points) and as
+the labelled fallback when SeaRoute fails
+"""
+
+import math
+
+# Mean Earth radius
+EARTH_RADIUS_KM = 6371.0088
+
+# Kilometers per nautical mile (exact, by definition)
+KM_PER_NM = 1.852
+
+
+def haversine_km(origin_lon: float, origin_lat: float, dest_lon: float, dest_lat: float) -> float:
+    """
+    Great circle distance between two points
+
+    Args:
+        origin_lon: Origin longitude
+        origin_lat: Origin latitude
+        dest_lon: Destination longitude
+        dest_lat: Destination latitude
+
+    Returns:
+        Distance in kilometers
+    """
+    phi1 = math.radians(origin_lat)
+    phi2 = math.radians(dest_lat)
+    dphi = phi2 - phi1
+    dlambda = math.radians(dest_lon - origin_lon)
+
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
@@ -4,41 +4,126 @@ Java SeaRoute Wrapper for Python
 Provides accurate maritime distance calculations using the Java SeaRoute implementation
 """
 
+import csv
 import subprocess
 import json
+import shutil
 import tempfile
+import threading
 import os
+import queue
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Optional
-import pandas as pd
+
+from great_circle import KM_PER_NM
+
+try:
+    import jpype
+    JPYPE_AVAILABLE = True
+except ImportError:
+    JPYPE_AVAILABLE = False
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# The bundled SeaRoute files, found relative to this file so the wrapper
+# works from any working directory
+SEAROUTE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                            'java-searoute')
+
+# Set SEAROUTE_JAR_PATH to use a JAR installed elsewhere
+DEFAULT_JAR_PATH = os.environ.get('SEAROUTE_JAR_PATH') or os.path.join(SEAROUTE_DIR, 'searoute.jar')
+
+# SeaRoute looks for marnet/marnet_plus_<res>km.gpkg on the classpath, then
+# relative to its working directory. Java processes run from the directory
+# holding marnet/ and the in-process JVM gets it on its classpath (server/ by
+# default; set SEAROUTE_NETWORK_DIR to use another copy)
+SEAROUTE_NETWORK_DIR = os.environ.get('SEAROUTE_NETWORK_DIR') or os.path.dirname(SEAROUTE_DIR)
+
+# Line-based SeaRoute server, run from source with the JAR on the classpath (Java 11+)
+SERVER_SOURCE = os.path.join(SEAROUTE_DIR, 'SeaRouteServer.java')
+
+# Seconds the SeaRoute server may take to load the network, and to answer
+# one route (the same limit as a single JAR run)
+SERVER_START_TIMEOUT = 120
+SERVER_ROUTE_TIMEOUT = 60
+
+# Per-call JAR runs exit after one batch, so they stop at the quick C1
+# compiler and reuse the JDK's class data archive to start faster
+ONE_SHOT_JVM_FLAGS = ['-Xshare:auto', '-XX:TieredStopAtLevel=1']
+
+# Set SEAROUTE_DEBUG=1 to log every Java command and its output
+DEBUG = bool(os.environ.get('SEAROUTE_DEBUG'))
+
+# The JAR only reads and writes files, so on Linux they are kept in RAM
+TEMP_ROOT = '/dev/shm' if os.path.isdir('/dev/shm') and os.access('/dev/shm', os.W_OK) else None
+
+def _write_routes_csv(path: str, routes: List[Dict], names: List[str]):
+    """Write routes in the JAR's input CSV format"""
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f, lineterminator='\n')
+        writer.writerow(['route name', 'olon', 'olat', 'dlon', 'dlat'])
+        for name, route in zip(names, routes):
+            writer.writerow([name, route['origin_lon'], route['origin_lat'],
+                             route['dest_lon'], route['dest_lat']])
+
+def _read_geojson(path: str) -> Dict:
+    """Parse a SeaRoute GeoJSON output file, using orjson when it is installed"""
+    with open(path, 'rb') as f:
+        content = f.read()
+    if ORJSON_AVAILABLE:
+        return orjson.loads(content)
+    return json.loads(content)
+
+def find_java() -> Optional[str]:
+    """
+    Locate the Java binary
+
+    Checks $JAVA_HOME/bin/java, then java on PATH, then the standard Linux
+    locations. Candidates are only checked for being executable files,
+    without starting a JVM, so this is cheap enough to run on every start.
+
+    Returns:
+        Path to the java executable, or None if none was found
+    """
+    java_paths = ['java', '/usr/bin/java', '/usr/lib/jvm/default-java/bin/java']
+    java_home = os.environ.get('JAVA_HOME')
+    if java_home:
+        java_paths.insert(0, os.path.join(java_home, 'bin', 'java'))
+
+    for path in java_paths:
+        # Absolute path of an executable file, searching PATH for bare names
+        path = shutil.which(path)
+        if path:
+            return path
+    return None
 
 class JavaSeaRouteWrapper:
     """Wrapper for Java SeaRoute implementation"""
     
-    def __init__(self, searoute_jar_path: str = "java-searoute/searoute.jar"):
+    def __init__(self, searoute_jar_path: str = DEFAULT_JAR_PATH):
         """
         Initialize the Java SeaRoute wrapper
         
         Args:
             searoute_jar_path: Path to the SeaRoute JAR file
         """
-        self.searoute_jar_path = searoute_jar_path
-        self.temp_dir = tempfile.mkdtemp()
+        self.searoute_jar_path = os.path.abspath(searoute_jar_path)
+        # Java runs from the network directory, independent of the process cwd
+        self.network_dir = os.path.abspath(SEAROUTE_NETWORK_DIR)
+        if not os.path.isdir(os.path.join(self.network_dir, 'marnet')):
+            print(f"Warning: no marnet/ network directory in {self.network_dir}")
+        self.temp_dir = tempfile.mkdtemp(dir=TEMP_ROOT)
         
-        # Check if Java is available (try multiple possible paths)
-        java_paths = ['java', '/usr/bin/java', '/usr/lib/jvm/default-java/bin/java']
-        self.java_binary = 'java'
-        
-        for path in java_paths:
-            try:
-                java_check = subprocess.run([path, '-version'], capture_output=True, text=True, timeout=10)
-                if java_check.returncode == 0:
-                    self.java_binary = path
-                    print(f"Java found at: {path}")
-                    break
-            except Exception:
-                continue
-        
-        if self.java_binary == 'java':
+        # Check if Java is available (see find_java)
+        self.java_binary = find_java()
+        if self.java_binary:
+            print(f"Java found at: {self.java_binary}")
+        else:
+            self.java_binary = 'java'
             print("Warning: Java not found in standard locations")
         
         # Verify JAR file exists
@@ -61,39 +146,38 @@ class JavaSeaRouteWrapper:
         Returns:
             Dictionary with distance results and route information
         """
+        # Separate working directory per call, so one wrapper can serve
+        # concurrent requests
+        work_dir = tempfile.mkdtemp(dir=self.temp_dir)
         try:
             # Create temporary CSV input file
-            input_file = os.path.join(self.temp_dir, "input.csv")
-            output_file = os.path.join(self.temp_dir, "output.geojson")
-            
-            # Prepare input data
-            input_data = {
-                'route name': ['Single Route'],
-                'olon': [origin_lon],
-                'olat': [origin_lat], 
-                'dlon': [dest_lon],
-                'dlat': [dest_lat]
-            }
+            input_file = os.path.join(work_dir, "input.csv")
+            output_file = os.path.join(work_dir, "output.geojson")
             
             # Write CSV file
-            df = pd.DataFrame(input_data)
-            df.to_csv(input_file, index=False)
+            _write_routes_csv(input_file, [{
+                'origin_lon': origin_lon, 'origin_lat': origin_lat,
+                'dest_lon': dest_lon, 'dest_lat': dest_lat
+            }], ['Single Route'])
             
             # Run Java SeaRoute
             cmd = [
-                self.java_binary, '-jar', self.searoute_jar_path,
+                self.java_binary, *ONE_SHOT_JVM_FLAGS, '-jar', self.searoute_jar_path,
                 '-i', input_file,
                 '-o', output_file,
                 '-res', '20'  # 20km resolution
             ]
             
             # Execute command
-            print(f"Running Java command: {' '.join(cmd)}")
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
+            if DEBUG:
+                print(f"Running Java command: {' '.join(cmd)}")
+            result = subprocess.run(cmd, capture_output=True, text=True, timeout=60,
+                                    cwd=self.network_dir)
             
-            print(f"Java return code: {result.returncode}")
-            print(f"Java stdout: {result.stdout}")
-            print(f"Java stderr: {result.stderr}")
+            if DEBUG:
+                print(f"Java return code: {result.returncode}")
+                print(f"Java stdout: {result.stdout}")
+                print(f"Java stderr: {result.stderr}")
             
             if result.returncode != 0:
                 raise Exception(f"Java SeaRoute failed: {result.stderr}")
@@ -102,8 +186,7 @@ class JavaSeaRouteWrapper:
             if not os.path.exists(output_file):
                 raise Exception("Output file was not created")
             
-            with open(output_file, 'r', encoding='utf-8') as f:
-                geojson_data = json.load(f)
+            geojson_data = _read_geojson(output_file)
             
             # Extract route information
             if not geojson_data.get('features'):
@@ -114,17 +197,14 @@ class JavaSeaRouteWrapper:
             
             # Extract distance information
             distance_km = float(properties.get('distKM', 0))
-            distance_nm = distance_km / 1.852  # Convert km to nautical miles
+            distance_nm = distance_km / KM_PER_NM
             
             # Extract route geometry for analysis
             geometry = feature.get('geometry', {})
             coordinates = geometry.get('coordinates', [])
             
             # Calculate route complexity (number of waypoints)
-            route_complexity = 0
-            if coordinates:
-                for line_string in coordinates:
-                    route_complexity += len(line_string)
+            route_complexity = sum(map(len, coordinates))
             
             return {
                 'success': True,
@@ -155,6 +235,8 @@ class JavaSeaRouteWrapper:
                 'route_name': 'Error',
                 'method': 'Java SeaRoute (Error)'
             }
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
     
     def calculate_multiple_routes(self, routes: List[Dict]) -> List[Dict]:
         """
@@ -166,34 +248,27 @@ class JavaSeaRouteWrapper:
         Returns:
             List of route results
         """
+        work_dir = tempfile.mkdtemp(dir=self.temp_dir)
         try:
             # Create temporary CSV input file
-            input_file = os.path.join(self.temp_dir, "batch_input.csv")
-            output_file = os.path.join(self.temp_dir, "batch_output.geojson")
-            
-            # Prepare batch input data
-            input_data = {
-                'route name': [f"Route_{i+1}" for i in range(len(routes))],
-                'olon': [route['origin_lon'] for route in routes],
-                'olat': [route['origin_lat'] for route in routes],
-                'dlon': [route['dest_lon'] for route in routes],
-                'dlat': [route['dest_lat'] for route in routes]
-            }
+            input_file = os.path.join(work_dir, "batch_input.csv")
+            output_file = os.path.join(work_dir, "batch_output.geojson")
             
             # Write CSV file
-            df = pd.DataFrame(input_data)
-            df.to_csv(input_file, index=False)
+            _write_routes_csv(input_file, routes,
+                              [f"Route_{i+1}" for i in range(len(routes))])
             
             # Run Java SeaRoute
             cmd = [
-                self.java_binary, '-jar', self.searoute_jar_path,
+                self.java_binary, *ONE_SHOT_JVM_FLAGS, '-jar', self.searoute_jar_path,
                 '-i', input_file,
                 '-o', output_file,
                 '-res', '20'  # 20km resolution
             ]
             
             # Execute command
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=120)
+            result = subprocess.run(cmd, capture_output=True, text=True, timeout=120,
+                                    cwd=self.network_dir)
             
             if result.returncode != 0:
                 raise Exception(f"Java SeaRoute batch failed: {result.stderr}")
@@ -202,23 +277,49 @@ class JavaSeaRouteWrapper:
             if not os.path.exists(output_file):
                 raise Exception("Batch output file was not created")
             
-            with open(output_file, 'r', encoding='utf-8') as f:
-                geojson_data = json.load(f)
+            geojson_data = _read_geojson(output_file)
             
             # Process results
             results = []
             features = geojson_data.get('features', [])
             
-            for i, feature in enumerate(features):
+            # The JAR copies the input columns into each feature, so results
+            # are matched to routes by name rather than by output order
+            named = all('route name' in feature['properties'] for feature in features)
+            by_name = {feature['properties']['route name']: feature for feature in features} if named else {}
+            
+            for i in range(len(routes)):
+                route_name = f"Route_{i+1}"
+                if named:
+                    feature = by_name.get(route_name)
+                else:
+                    feature = features[i] if i < len(features) else None
+                
+                if feature is None:
+                    results.append({
+                        'success': False,
+                        'error': 'No route returned',
+                        'distance_km': 0,
+                        'distance_nm': 0,
+                        'route_name': route_name,
+                        'method': 'Java SeaRoute (Batch Error)'
+                    })
+                    continue
+                
                 properties = feature['properties']
                 distance_km = float(properties.get('distKM', 0))
-                distance_nm = distance_km / 1.852
+                distance_nm = distance_km / KM_PER_NM
+                
+                # Calculate route complexity (number of waypoints)
+                coordinates = (feature.get('geometry') or {}).get('coordinates', [])
+                route_complexity = sum(map(len, coordinates))
                 
                 results.append({
                     'success': True,
                     'distance_km': round(distance_km, 1),
                     'distance_nm': round(distance_nm, 1),
-                    'route_name': f"Route_{i+1}",
+                    'route_name': route_name,
+                    'route_complexity': route_complexity,
                     'properties': properties,
                     'method': 'Java SeaRoute (Batch)'
                 })
@@ -235,11 +336,12 @@ class JavaSeaRouteWrapper:
                 'route_name': f"Route_{i+1}",
                 'method': 'Java SeaRoute (Batch Error)'
             } for i in range(len(routes))]
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
     
     def cleanup(self):
         """Clean up temporary files"""
         try:
-            import shutil
             shutil.rmtree(self.temp_dir)
         except Exception:
             pass  # Ignore cleanup errors
@@ -248,6 +350,275 @@ class JavaSeaRouteWrapper:
         """Destructor to clean up temporary files"""
         self.cleanup()
 
+class JPypeSeaRouteWrapper:
+    """
+    SeaRoute running inside this process through JPype
+    
+    Starts the JVM and loads the maritime network once, then calls the
+    SeaRouting Java API directly, so a route costs only the path search
+    instead of a JVM start plus CSV/GeoJSON round trip. Offers the same
+    calculate_distance / calculate_multiple_routes interface as
+    JavaSeaRouteWrapper.
+    
+    JPype releases the GIL during Java calls, so with workers > 1 several
+    routes are searched at once, each on its own copy of the network.
+    """
+    
+    def __init__(self, searoute_jar_path: str = DEFAULT_JAR_PATH, resolution: int = 20,
+                 workers: int = 1):
+        """
+        Start the JVM and load the SeaRoute network
+        
+        Args:
+            searoute_jar_path: Path to the SeaRoute JAR file
+            resolution: Network resolution in km (5, 10, 20, 50 or 100)
+            workers: Number of network copies, i.e. routes searched concurrently
+        """
+        if not JPYPE_AVAILABLE:
+            raise RuntimeError("JPype is not installed")
+        if not os.path.exists(searoute_jar_path):
+            raise FileNotFoundError(f"SeaRoute JAR file not found at: {searoute_jar_path}")
+        
+        if not jpype.isJVMStarted():
+            # The JVM shares this process's cwd, so the network is found
+            # through the classpath instead (see SEAROUTE_NETWORK_DIR)
+            jpype.startJVM(classpath=[os.path.abspath(searoute_jar_path),
+                                      os.path.abspath(SEAROUTE_NETWORK_DIR)])
+        SeaRouting = jpype.JClass('eu.europa.ec.eurostat.searoute.SeaRouting')
+        # The network graph keeps traversal state, so each copy serves one
+        # search at a time; callers wait for a free copy
+        self.workers = max(1, workers)
+        self._routers = queue.Queue()
+        for _ in range(self.workers):
+            self._routers.put(SeaRouting(resolution))
+        
+        print(f"Java SeaRoute loaded in-process with JAR: {searoute_jar_path}")
+    
+    def calculate_distance(self, origin_lon: float, origin_lat: float,
+                          dest_lon: float, dest_lat: float) -> Dict:
+        """
+        Calculate maritime distance using Java SeaRoute
+        
+        Args:
+            origin_lon: Origin longitude
+            origin_lat: Origin latitude
+            dest_lon: Destination longitude
+            dest_lat: Destination latitude
+            
+        Returns:
+            Dictionary with distance results and route information
+        """
+        try:
+            routing = self._routers.get()
+            try:
+                feature = routing.getRoute(float(origin_lon), float(origin_lat),
+                                           float(dest_lon), float(dest_lat))
+                distance_km = feature.getAttribute('distKM')
+                geometry = feature.getGeometry()
+                route_complexity = int(geometry.getNumPoints()) if geometry is not None else 0
+            finally:
+                self._routers.put(routing)
+            
+            if distance_km is None:
+                raise Exception("No route found")
+            distance_km = float(distance_km)
+            
+            return {
+                'success': True,
+                'distance_km': round(distance_km, 1),
+                'distance_nm': round(distance_km / KM_PER_NM, 1),
+                'route_name': 'Maritime Route (Java SeaRoute)',
+                'route_complexity': route_complexity,
+                'method': 'Java SeaRoute (In-process)'
+            }
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e),
+                'distance_km': 0,
+                'distance_nm': 0,
+                'route_name': 'Error',
+                'method': 'Java SeaRoute (Error)'
+            }
+    
+    def calculate_multiple_routes(self, routes: List[Dict]) -> List[Dict]:
+        """
+        Calculate multiple routes
+        
+        Args:
+            routes: List of route dictionaries with origin_lon, origin_lat, dest_lon, dest_lat
+            
+        Returns:
+            List of route results
+        """
+        def run(route):
+            return self.calculate_distance(route['origin_lon'], route['origin_lat'],
+                                           route['dest_lon'], route['dest_lat'])
+        
+        if self.workers > 1 and len(routes) > 1:
+            with ThreadPoolExecutor(max_workers=min(self.workers, len(routes))) as pool:
+                results = list(pool.map(run, routes))
+        else:
+            results = [run(route) for route in routes]
+        
+        for i, result in enumerate(results):
+            result['route_name'] = f"Route_{i+1}"
+        return results
+    
+    def cleanup(self):
+        """Nothing to clean up; the JVM is shut down by JPype at exit"""
+
+class SeaRouteServerWrapper:
+    """
+    SeaRoute running in one long-lived Java process
+    
+    Starts java-searoute/SeaRouteServer.java once and sends it one route per
+    line over stdin/stdout, so the network is loaded a single time without
+    embedding the JVM. Offers the same calculate_distance /
+    calculate_multiple_routes interface as JavaSeaRouteWrapper.
+    """
+    
+    def __init__(self, searoute_jar_path: str = DEFAULT_JAR_PATH, resolution: int = 20):
+        """
+        Start the SeaRoute server process and wait for the network to load
+        
+        Args:
+            searoute_jar_path: Path to the SeaRoute JAR file
+            resolution: Network resolution in km (5, 10, 20, 50 or 100)
+        """
+        self.searoute_jar_path = os.path.abspath(searoute_jar_path)
+        # Java runs from the network directory, see SEAROUTE_NETWORK_DIR
+        self.network_dir = os.path.abspath(SEAROUTE_NETWORK_DIR)
+        self.resolution = resolution
+        if not os.path.exists(self.searoute_jar_path):
+            raise FileNotFoundError(f"SeaRoute JAR file not found at: {self.searoute_jar_path}")
+        if not os.path.exists(SERVER_SOURCE):
+            raise FileNotFoundError(f"SeaRoute server source not found at: {SERVER_SOURCE}")
+        self.java_binary = find_java()
+        if not self.java_binary:
+            raise RuntimeError("Java not found")
+        
+        # One request on the pipe at a time
+        self._lock = threading.Lock()
+        self._proc = None
+        self._start()
+        
+        print(f"Java SeaRoute server started with JAR: {self.searoute_jar_path}")
+    
+    def _start(self):
+        """Start the server process and wait until the network is loaded"""
+        # The process exits on its own once stdin closes with this process
+        self._proc = subprocess.Popen(
+            [self.java_binary, '-cp', self.searoute_jar_path, SERVER_SOURCE, str(self.resolution)],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            stderr=None if DEBUG else subprocess.DEVNULL,
+            text=True, bufsize=1, cwd=self.network_dir)
+        # Replies are read on a thread so waiting for them can time out
+        self._replies = queue.Queue()
+        threading.Thread(target=self._read_replies, args=(self._proc, self._replies),
+                         daemon=True).start()
+        
+        if self._next_reply(SERVER_START_TIMEOUT) != 'READY':
+            self._stop()
+            raise RuntimeError("SeaRoute server did not start")
+    
+    @staticmethod
+    def _read_replies(proc: subprocess.Popen, replies: queue.Queue):
+        """Queue each stdout line of the process, then None once it exits"""
+        for line in proc.stdout:
+            replies.put(line.strip())
+        replies.put(None)
+    
+    def _next_reply(self, timeout: float) -> Optional[str]:
+        """Return the next reply line, or None if the process exited or timed out"""
+        try:
+            return self._replies.get(timeout=timeout)
+        except queue.Empty:
+            return None
+    
+    def _stop(self):
+        """Stop the server process if it is still running"""
+        if self._proc is not None and self._proc.poll() is None:
+            self._proc.terminate()
+            try:
+                self._proc.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self._proc.kill()
+    
+    def calculate_distance(self, origin_lon: float, origin_lat: float,
+                          dest_lon: float, dest_lat: float) -> Dict:
+        """
+        Calculate maritime distance using Java SeaRoute
+        
+        Args:
+            origin_lon: Origin longitude
+            origin_lat: Origin latitude
+            dest_lon: Destination longitude
+            dest_lat: Destination latitude
+            
+        Returns:
+            Dictionary with distance results and route information
+        """
+        try:
+            with self._lock:
+                # Replace a server that crashed or was stopped after a timeout
+                if self._proc.poll() is not None:
+                    self._start()
+                self._proc.stdin.write(f"{float(origin_lon)} {float(origin_lat)} "
+                                       f"{float(dest_lon)} {float(dest_lat)}\n")
+                self._proc.stdin.flush()
+                reply = self._next_reply(SERVER_ROUTE_TIMEOUT)
+                if reply is None:
+                    # Hung or crashed; the next route starts a new process
+                    self._stop()
+            
+            if reply is None:
+                raise Exception("SeaRoute server stopped or timed out")
+            if reply.startswith('ERROR'):
+                raise Exception(reply[len('ERROR'):].strip() or "No route found")
+            distance_km, route_complexity = reply.split()
+            distance_km = float(distance_km)
+            
+            return {
+                'success': True,
+                'distance_km': round(distance_km, 1),
+                'distance_nm': round(distance_km / KM_PER_NM, 1),
+                'route_name': 'Maritime Route (Java SeaRoute)',
+                'route_complexity': int(route_complexity),
+                'method': 'Java SeaRoute (Server)'
+            }
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e),
+                'distance_km': 0,
+                'distance_nm': 0,
+                'route_name': 'Error',
+                'method': 'Java SeaRoute (Error)'
+            }
+    
+    def calculate_multiple_routes(self, routes: List[Dict]) -> List[Dict]:
+        """
+        Calculate multiple routes
+        
+        Args:
+            routes: List of route dictionaries with origin_lon, origin_lat, dest_lon, dest_lat
+            
+        Returns:
+            List of route results
+        """
+        results = []
+        for i, route in enumerate(routes):
+            result = self.calculate_distance(route['origin_lon'], route['origin_lat'],
+                                             route['dest_lon'], route['dest_lat'])
+            result['route_name'] = f"Route_{i+1}"
+            results.append(result)
+        return results
+    
+    def cleanup(self):
+        """Stop the SeaRoute server process"""
+        self._stop()
+
 # Test function
 def test_java_searoute():
     """Test the Java SeaRoute wrapper"""
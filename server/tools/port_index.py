@@ -0,0 +1,407 @@
+#!/usr/bin/env python3
+"""
+Port Index for fast port search
+Builds a trigram table and a joined search blob over port names and
+countries once, so search-as-you-type no longer scans the whole port database
+per keystroke
+"""
+
+import heapq
+import json
+import mmap
+import os
+import pickle
+import sys
+from bisect import bisect_right
+from functools import lru_cache
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+import numpy as np
+
+from great_circle import EARTH_RADIUS_KM
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+try:
+    import ijson
+    IJSON_AVAILABLE = True
+except ImportError:
+    IJSON_AVAILABLE = False
+
+# Port files larger than this are stream-parsed with ijson when it is installed
+STREAM_THRESHOLD_BYTES = 50 * 1024 * 1024
+
+# Bump when PortIndex's attributes change, so stale pickle caches are rebuilt
+CACHE_VERSION = 3
+
+def _intern(value):
+    """Intern strings so repeated values (countries, regions) share one object"""
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class Port(NamedTuple):
+    """A port from the port database (a tuple, so no per-instance __dict__)"""
+    name: str
+    country: str
+    region: str
+    lon: float
+    lat: float
+    alternate: Optional[str] = None
+    is_eea: bool = False
+
+    def as_dict(self) -> Dict:
+        """Port fields returned by the search API"""
+        return {
+            'name': self.name,
+            'country': self.country,
+            'lat': self.lat,
+            'lon': self.lon,
+            'is_eea': self.is_eea
+        }
+
+
+class PortIndex:
+    """Search index over the port database"""
+
+    def __init__(self, ports: Iterable[Dict]):
+        """
+        Build the search index
+
+        Ports are stored column-wise (one list or array per field) rather
+        than as one object per port; Port objects are only created for the
+        ports a caller actually asks for.
+
+        Args:
+            ports: Port dictionaries as loaded from data/ports.json; any
+                iterable works, so records can be streamed in
+        """
+        names, countries, regions, alternates = [], [], [], []
+        lons, lats, is_eea = [], [], []
+
+        for data in ports:
+            try:
+                lon = float(data.get('lon', 0))
+                lat = float(data.get('lat', 0))
+            except (ValueError, TypeError):
+                # Skip ports with invalid data
+                continue
+
+            names.append(data.get('name', ''))
+            countries.append(_intern(data.get('country', '')))
+            regions.append(_intern(data.get('region', '')))
+            alternates.append(data.get('alternate'))
+            lons.append(lon)
+            lats.append(lat)
+            is_eea.append(bool(data.get('is_eea', False)))
+
+        self.names = names
+        self.countries = countries
+        self.regions = regions
+        self.alternates = alternates
+        self.lons = np.array(lons, dtype=np.float64)
+        self.lats = np.array(lats, dtype=np.float64)
+        self.is_eea = np.array(is_eea, dtype=bool)
+        self.cache_version = CACHE_VERSION
+        # (mtime_ns, size) of the JSON file, set by from_file
+        self.source_key = None
+
+        # Coordinates in radians and cos(latitude), computed once for
+        # great circle distances from a point to every port
+        self._lat_rad = np.radians(self.lats)
+        self._lon_rad = np.radians(self.lons)
+        self._cos_lat = np.cos(self._lat_rad)
+
+        # Exact coordinates of each port (first port wins), so looking up a
+        # port the page selected is a dict hit instead of an array scan
+        self._by_coords = {}
+        for port_id, coords in enumerate(zip(lats, lons)):
+            self._by_coords.setdefault(coords, port_id)
+
+        # Case-folded once here so searches only do substring tests
+        self._name_lc = [name.casefold() for name in names]
+        self._country_lc = [sys.intern(str(country).casefold()) for country in countries]
+        self._search = [name + '\0' + country
+                        for name, country in zip(self._name_lc, self._country_lc)]
+
+        self._trigrams = {}
+        for port_id, fields in enumerate(zip(self._name_lc, self._country_lc)):
+            for text in fields:
+                for i in range(len(text) - 2):
+                    self._trigrams.setdefault(text[i:i + 3], set()).add(port_id)
+
+        # All search strings in one newline-joined blob, so short queries
+        # are a single C-level str.find scan instead of a per-port loop
+        self._offsets = []
+        offset = 0
+        for text in self._search:
+            self._offsets.append(offset)
+            offset += len(text) + 1
+        self._blob = '\n'.join(self._search)
+
+        # Each port's search API JSON, encoded once so responses are
+        # assembled by joining bytes instead of building and encoding dicts
+        self._json = [self._encode(self.port(port_id).as_dict()) for port_id in range(len(names))]
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def port(self, port_id: int) -> Port:
+        """Build the Port view for one port id"""
+        return Port(
+            name=self.names[port_id],
+            country=self.countries[port_id],
+            region=self.regions[port_id],
+            lon=float(self.lons[port_id]),
+            lat=float(self.lats[port_id]),
+            alternate=self.alternates[port_id],
+            is_eea=bool(self.is_eea[port_id])
+        )
+
+    def find_port(self, lat: float, lon: float, tolerance: float = 0.01) -> Optional[Port]:
+        """
+        Find the first port within `tolerance` degrees of a coordinate
+
+        A port at exactly the given coordinate is returned without scanning.
+
+        Args:
+            lat: Latitude
+            lon: Longitude
+            tolerance: Maximum difference per axis, in degrees
+
+        Returns:
+            The matching port, or None
+        """
+        port_id = self._by_coords.get((lat, lon))
+        if port_id is not None:
+            return self.port(port_id)
+
+        mask = (np.abs(self.lats - lat) < tolerance) & (np.abs(self.lons - lon) < tolerance)
+        port_ids = np.flatnonzero(mask)
+        if port_ids.size == 0:
+            return None
+        return self.port(int(port_ids[0]))
+
+    def _distances_km(self, lat: float, lon: float) -> np.ndarray:
+        """Great circle distance in km from a point to every port"""
+        lat_rad = np.radians(lat)
+        lon_rad = np.radians(lon)
+        a = (np.sin((self._lat_rad - lat_rad) * 0.5) ** 2
+             + np.cos(lat_rad) * self._cos_lat * np.sin((self._lon_rad - lon_rad) * 0.5) ** 2)
+        return 2 * EARTH_RADIUS_KM * np.arcsin(np.minimum(1.0, np.sqrt(a)))
+
+    def nearest_ports(self, lat: float, lon: float, k: int = 10) -> List[Tuple[int, float]]:
+        """
+        Find the `k` ports closest to a coordinate
+
+        Args:
+            lat: Latitude
+            lon: Longitude
+            k: Number of ports to return
+
+        Returns:
+            (port id, great circle distance in km) pairs, nearest first
+        """
+        k = min(k, len(self))
+        if k <= 0:
+            return []
+        distances = self._distances_km(lat, lon)
+        # Partition out the k nearest, then only sort those
+        port_ids = np.argpartition(distances, k - 1)[:k]
+        port_ids = port_ids[np.argsort(distances[port_ids], kind='stable')]
+        return [(int(port_id), float(distances[port_id])) for port_id in port_ids]
+
+    @classmethod
+    def from_file(cls, ports_file: str, cache_file: Optional[str] = None) -> 'PortIndex':
+        """
+        Load the index for a ports JSON file
+
+        A pickled copy of the built index is kept next to the JSON file and
+        reused while the JSON's modification time and size match the ones it
+        was built from, skipping parsing and index construction on later
+        starts.
+
+        Args:
+            ports_file: Path to the ports JSON file
+            cache_file: Path to the pickle cache (defaults to <ports_file>.pkl)
+
+        Returns:
+            The port index (empty if the ports could not be loaded)
+        """
+        if cache_file is None:
+            cache_file = os.path.splitext(ports_file)[0] + '.pkl'
+
+        try:
+            stat = os.stat(ports_file)
+            source_key = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            source_key = None
+
+        try:
+            with open(cache_file, 'rb') as f:
+                index = pickle.load(f)
+            if (getattr(index, 'cache_version', None) == CACHE_VERSION
+                    and getattr(index, 'source_key', None) == source_key):
+                print(f"Loaded {len(index)} ports from {cache_file}")
+                return index
+        except Exception:
+            pass  # Missing or unreadable cache, rebuild it
+
+        try:
+            if IJSON_AVAILABLE and os.path.getsize(ports_file) > STREAM_THRESHOLD_BYTES:
+                # Build the columns as records arrive instead of first
+                # holding the whole parsed document in memory
+                with open(ports_file, 'rb') as f:
+                    index = cls(ijson.items(f, 'item', use_float=True))
+            else:
+                index = cls(cls._read_ports(ports_file))
+            print(f"Loaded {len(index)} ports from {ports_file}")
+        except Exception as e:
+            print(f"Error loading ports: {e}")
+            return cls([])
+        index.source_key = source_key
+
+        try:
+            with open(cache_file, 'wb') as f:
+                pickle.dump(index, f, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            print(f"Could not write port cache: {e}")
+        return index
+
+    @staticmethod
+    def _read_ports(ports_file: str) -> List[Dict]:
+        """Parse a whole ports JSON file at once"""
+        with open(ports_file, 'rb') as f:
+            # Map the file so orjson parses straight from the page cache
+            # without first copying it into a bytes object
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as content:
+                if ORJSON_AVAILABLE:
+                    try:
+                        with memoryview(content) as view:
+                            return orjson.loads(view)
+                    except orjson.JSONDecodeError:
+                        pass  # e.g. NaN values, which only the stdlib parser accepts
+                return json.loads(content[:])
+
+    @staticmethod
+    def _encode(data: Dict) -> bytes:
+        """Encode one port dictionary as compact JSON"""
+        if ORJSON_AVAILABLE:
+            return orjson.dumps(data)
+        return json.dumps(data, separators=(',', ':')).encode()
+
+    def _substring_matches(self, term: str) -> Set[int]:
+        """Find all ports whose name or country contains term"""
+        if len(term) < 3:
+            return self._scan_blob(term)
+
+        # Only ports containing every trigram of the term can match
+        postings = []
+        for trigram in {term[i:i + 3] for i in range(len(term) - 2)}:
+            ids = self._trigrams.get(trigram)
+            if not ids:
+                return set()
+            postings.append(ids)
+
+        # Intersect from the rarest trigram up, so every step works on the
+        # smallest candidate set so far
+        postings.sort(key=len)
+        candidates = set(postings[0])
+        for ids in postings[1:]:
+            candidates &= ids
+            if not candidates:
+                return candidates
+
+        search = self._search
+        return {port_id for port_id in candidates if term in search[port_id]}
+
+    def _scan_blob(self, term: str) -> Set[int]:
+        """Find all ports containing term with one pass over the search blob"""
+        found = set()
+        if '\n' in term:
+            return found
+
+        blob = self._blob
+        offsets = self._offsets
+        pos = blob.find(term)
+        while pos != -1:
+            port_id = bisect_right(offsets, pos) - 1
+            found.add(port_id)
+            # Continue from the next port's search string
+            if port_id + 1 == len(offsets):
+                break
+            pos = blob.find(term, offsets[port_id + 1])
+        return found
+
+    def _all_terms_matches(self, terms: List[str]) -> Set[int]:
+        """Find all ports whose name or country contains every term"""
+        port_ids = None
+        # Longest terms first: they have the fewest candidates
+        for term in sorted(terms, key=len, reverse=True):
+            matches = self._substring_matches(term)
+            port_ids = matches if port_ids is None else port_ids & matches
+            if not port_ids:
+                break
+        return port_ids or set()
+
+    @lru_cache(maxsize=2048)
+    def search_ids(self, search_term: str, limit: int = 20) -> Tuple[int, ...]:
+        """
+        Search ports by name or country
+
+        Every port containing the term is collected through the trigram
+        table (or the blob scan for short terms) and ranked; only the best
+        `limit` are returned. Queries of several words (e.g. "hamburg de")
+        also match ports containing every word of two or more characters,
+        ranked after ports containing the exact phrase. Results are memoized
+        per (search_term, limit), so retyped or repeated queries skip the
+        search entirely.
+
+        Args:
+            search_term: Text typed by the user
+            limit: Maximum number of results
+
+        Returns:
+            Port ids sorted by relevance
+        """
+        if not search_term or len(search_term) < 2:
+            return ()
+
+        search_term = search_term.casefold()
+        # Single letters (e.g. "san f" while typing) match most ports, and a
+        # lone remaining word is just a broader search, so word matching
+        # needs at least two words of two or more characters
+        terms = [term for term in search_term.split() if len(term) >= 2]
+        port_ids = self._substring_matches(search_term)
+        # Word matches rank after every phrase match, so they are only
+        # needed when the phrase matches do not fill the results
+        if len(terms) > 1 and len(port_ids) < limit:
+            port_ids |= self._all_terms_matches(terms)
+
+        # Sort by relevance (exact matches first)
+        def sort_key(port_id):
+            name_lc = self._name_lc[port_id]
+            country_lc = self._country_lc[port_id]
+            phrase_match = search_term in self._search[port_id]
+            if phrase_match:
+                name_match = search_term in name_lc
+                country_match = search_term in country_lc
+            else:
+                name_match = all(term in name_lc for term in terms)
+                country_match = all(term in country_lc for term in terms)
+            if name_match and country_match:
+                return (not phrase_match, 0, self.names[port_id], port_id)
+            elif name_match:
+                return (not phrase_match, 1, self.names[port_id], port_id)
+            else:
+                return (not phrase_match, 2, self.names[port_id], port_id)
+
+        # Only the best `limit` candidates are ordered, not all of them
+        return tuple(heapq.nsmallest(limit, port_ids, key=sort_key))
+
+    def ports_json(self, port_ids: Iterable[int]) -> bytes:
+        """Encode ports as a JSON array of their search API dictionaries"""
+        return b'[' + b','.join([self._json[port_id] for port_id in port_ids]) + b']'